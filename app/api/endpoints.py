@@ -1,12 +1,18 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Depends
-from app.services.document_service import extract_text_from_file_bytes, chunk_text, save_document_metadata
-from app.services.vector_store_manager import embed_and_store_chunks
-from app.api.models import IngestionResponse, ChunkingStrategy, ChatResponse, ConversationMode, KnowledgeBaseMode
-from app.core.db import get_db
+from fastapi import APIRouter, BackgroundTasks, File, UploadFile, HTTPException, Form, Depends
+from fastapi.concurrency import run_in_threadpool
+from app.services.document_service import iter_chunks_from_file_path, save_document_metadata, update_document_status, get_document_metadata
+from app.services.vector_store_manager import embed_and_store_chunks, delete_document_chunks
+from app.services.llm_service import get_rag_service
+from app.api.models import IngestionResponse, ChunkingStrategy, DocumentStatus, ChatResponse, ConversationMode, KnowledgeBaseMode
+from app.core.db import get_db, session_scope
+from app.core.ids import new_id
 from sqlalchemy.orm import Session
-from typing import Annotated
+from typing import Annotated, Optional, Tuple
+import logging
 import os
-import uuid
+import tempfile
+
+logger = logging.getLogger(__name__)
 
 
 # ============================================
@@ -19,83 +25,227 @@ document_router = APIRouter(
 )
 
 # --- Defining allowed extensions ---
-ALLOWED_EXTENSIONS = {'.pdf', '.txt'}
+ALLOWED_SUFFIXES = ('.pdf', '.txt')
+
+# --- Defining allowed content types and upload size limit ---
+# application/octet-stream is the generic type many clients send for any file
+ALLOWED_CONTENT_TYPES = {'application/pdf', 'text/plain', 'application/octet-stream'}
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024  # 50 MB
+
+
+def _save_metadata_in_new_session(
+    document_id: str,
+    filename: str,
+    chunking_strategy: ChunkingStrategy,
+    num_chunks: int,
+    file_size: int,
+    status: DocumentStatus
+) -> None:
+    """Saves document metadata from a worker thread using its own short-lived session."""
+    with session_scope() as db:
+        save_document_metadata(
+            db=db,
+            document_id=document_id,
+            filename=filename,
+            chunking_strategy=chunking_strategy,
+            num_chunks=num_chunks,
+            file_size=file_size,
+            status=status
+        )
+
+
+def _update_status_in_new_session(
+    document_id: str,
+    status: DocumentStatus,
+    num_chunks: int,
+    extracted_text_length: Optional[int] = None
+) -> None:
+    """Updates a document's status from a worker thread using its own short-lived session."""
+    with session_scope() as db:
+        update_document_status(db, document_id, status, num_chunks, extracted_text_length)
+
+
+async def _spool_upload_to_disk(file: UploadFile, suffix: str) -> Tuple[str, int]:
+    """
+    Streams the upload into a named temporary file in 1 MB chunks.
+    The PDF extraction worker processes open the file by path.
+    File system calls run in the threadpool so disk I/O never blocks the event loop.
+    Returns the file path and its size in bytes.
+    
+    Raises:
+        HTTPException(413): If the file exceeds MAX_UPLOAD_BYTES (Content-Length can be absent or wrong).
+    """
+    tmp = await run_in_threadpool(tempfile.NamedTemporaryFile, suffix=suffix, delete=False)
+    try:
+        with tmp:
+            while chunk := await file.read(1 << 20):
+                await run_in_threadpool(tmp.write, chunk)
+                if tmp.tell() > MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum upload size is {MAX_UPLOAD_BYTES} bytes."
+                    )
+            return tmp.name, tmp.tell()
+    except BaseException:
+        await run_in_threadpool(os.remove, tmp.name)
+        raise
+
+
+async def _ingest_document(
+    document_id: str,
+    file_path: str,
+    file_extension: str,
+    chunking_strategy: ChunkingStrategy
+) -> None:
+    """
+    Background part of an upload, run after the 202 response has been sent.
+    Extracts, chunks and embeds the spooled file, then marks the document 'ready'.
+    On failure any stored chunks are removed and the document is marked 'failed'.
+    The spooled file is always deleted.
+    """
+    # Filled in as the file streams through extraction and chunking
+    stats = {"num_chunks": 0, "text_length": 0}
+    try:
+        # Extract text page by page and chunk it as it streams in, based on the
+        # selected strategy (PDF pages are parsed in parallel in the process pool);
+        # each batch of chunks is embedded as soon as it fills, so the worker thread
+        # never holds the whole document
+        chunks = iter_chunks_from_file_path(file_path, file_extension, chunking_strategy, stats)
+        
+        # Embed/Store in Pinecone (repeated chunks are embedded once; batches run
+        # concurrently in the embedder's own thread pool)
+        distinct, stored = await run_in_threadpool(embed_and_store_chunks, chunks, document_id)
+        
+        # Failed embedding batches are only logged, so compare what was stored
+        # with what should have been before reporting the document as searchable
+        if stored < distinct:
+            raise RuntimeError(f"Only {stored} of {distinct} chunks were embedded and stored")
+        
+        # Mark the document as searchable
+        await run_in_threadpool(
+            _update_status_in_new_session,
+            document_id, DocumentStatus.READY, stats["num_chunks"], stats["text_length"]
+        )
+        
+    except Exception:
+        logger.exception("Error processing document %s", document_id)
+        # Undo partial work so no half-ingested document remains
+        # (chunk ids run from 0 to the number of chunks produced before the failure)
+        num_chunks = stats["num_chunks"]
+        if num_chunks:
+            try:
+                await run_in_threadpool(delete_document_chunks, document_id, num_chunks)
+            except Exception:
+                logger.exception("Error removing stored chunks of document %s", document_id)
+        # The status is updated even if the rollback failed, so the document is never left 'pending'
+        try:
+            await run_in_threadpool(
+                _update_status_in_new_session, document_id, DocumentStatus.FAILED, num_chunks
+            )
+        except Exception:
+            logger.exception("Error marking document %s as failed", document_id)
+    finally:
+        await run_in_threadpool(os.remove, file_path)
+
 
-@document_router.post('/upload/', response_model=IngestionResponse)
+@document_router.post('/upload/', response_model=IngestionResponse, status_code=202)
 async def upload_document_file(
     file: Annotated[UploadFile, File(...)],
-    chunking_strategy: Annotated[ChunkingStrategy, Form()] = ChunkingStrategy.FIXED,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    chunking_strategy: Annotated[ChunkingStrategy, Form()] = ChunkingStrategy.FIXED
 ):
     """
     Handles a file upload request, restricted to .pdf and .txt files.
-    Extracts text, chunks it, embeds/stores in Pinecone, and saves metadata to DB.
+    Stores the file and its metadata (status 'pending') and returns 202 right away;
+    text extraction, chunking and embedding into Pinecone run in a background task.
+    Poll GET /documents/{document_id} for the outcome.
     """
     
-    # 1. Access the file's metadata
+    # 1. Generate a unique document ID up front, so every later step can use it right away
+    doc_id = new_id()
+    
+    # 2. Access the file's metadata
     file_name = file.filename
 
-    # 2. If file_name is None
+    # 3. If file_name is None
     if not file_name:
         raise HTTPException(status_code=400, detail="File must have a name.")
     
-    # 3. Get the file extension
-    file_extension = os.path.splitext(file_name)[1].lower()
-
-    # 4. Check if the extension is in our allowed set
-    if file_extension not in ALLOWED_EXTENSIONS:
+    # 4. Check the declared media type (parameters like charset are ignored) before touching
+    # the file body; parts sent without a Content-Type are left to the suffix check
+    media_type = (file.content_type or "").split(';')[0].strip().lower()
+    if media_type and media_type not in ALLOWED_CONTENT_TYPES:
+        await file.close()
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported content type: {file.content_type}. Only PDF and plain text files are allowed."
+        )
+    
+    # 5. Check the file name against our allowed suffixes (single C-level pass)
+    lower_name = file_name.lower()
+    if not lower_name.endswith(ALLOWED_SUFFIXES):
         await file.close() 
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type: {file_extension}. Only .pdf and .txt files are allowed."
+            detail=f"Unsupported file type: {os.path.splitext(lower_name)[1]}. Only .pdf and .txt files are allowed."
         )
     
+    # 6. Get the file extension for the extractor dispatch
+    file_extension = '.' + lower_name.rsplit('.', 1)[-1]
+    
+    tmp_path = None
     try:
-        # 5. Read the file content
-        file_bytes = await file.read()
-        file_size = len(file_bytes)
-        
-        # 6. Extract text from the file
-        # We cast file_extension to the Literal type expected by the function
-        text_content = extract_text_from_file_bytes(file_bytes, file_extension) # type: ignore
-        
-        # 7. Chunk the text based on the selected strategy
-        chunks = chunk_text(text_content, chunking_strategy)
-        
-        # 8. Generate a unique document ID
-        doc_id = str(uuid.uuid4())
+        # 7. Stream the file to disk (constant memory, readable by worker processes)
+        tmp_path, file_size = await _spool_upload_to_disk(file, file_extension)
         
-        # 9. Embed and Store in Pinecone (using integrated embeddings)
-        # This will generate embeddings and upsert them to the 'ragtask1' index
-        embed_and_store_chunks(chunks, doc_id)
-        
-        # 10. Save Metadata to Neon PostgreSQL
-        save_document_metadata(
-            db=db,
-            document_id=doc_id,
-            filename=file_name,
-            chunking_strategy=chunking_strategy,
-            num_chunks=len(chunks),
-            file_size=file_size
+        # 8. Save metadata to Neon PostgreSQL as 'pending', so the status can be polled right away
+        await run_in_threadpool(
+            _save_metadata_in_new_session,
+            doc_id, file_name, chunking_strategy, 0, file_size, DocumentStatus.PENDING
         )
         
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        # 9. Extract, chunk and embed after the response is sent (the task now owns the file)
+        background_tasks.add_task(_ingest_document, doc_id, tmp_path, file_extension, chunking_strategy)
+        tmp_path = None
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        # Catch other errors (like DB or Pinecone issues)
-        print(f"Error processing document: {e}")
+        # Catch other errors (like DB issues)
+        logger.exception("Error accepting document %s", doc_id)
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
     finally:
         await file.close()
+        if tmp_path:
+            await run_in_threadpool(os.remove, tmp_path)
 
-    # 11. Return the result using the Pydantic model
+    # 10. Return the result using the Pydantic model
     return IngestionResponse(
-        message="File processed, embedded, and stored successfully",
+        message="File accepted for processing",
         filename=file_name,
         document_id=doc_id,
         chunking_strategy=chunking_strategy,
-        extracted_text_length=len(text_content),
-        num_chunks=len(chunks)
+        status=DocumentStatus.PENDING
+    )
+
+
+@document_router.get('/{document_id}', response_model=IngestionResponse)
+def get_document_status(document_id: str, db: Session = Depends(get_db)):
+    """
+    Returns the processing status of an uploaded document.
+    """
+    document = get_document_metadata(db, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+    
+    return IngestionResponse(
+        message=f"Document is {document.status.value}",
+        filename=document.filename,
+        document_id=document.document_id,
+        chunking_strategy=document.chunking_strategy,
+        status=document.status,
+        extracted_text_length=document.extracted_text_length,
+        num_chunks=document.num_chunks
     )
 
 
@@ -137,8 +287,6 @@ async def conversational_rag(
     Returns:
         ChatResponse with LLM answer, metadata, and booking status
     """
-    from app.services.llm_service import get_rag_service
-    
     try:
         # Get the RAG service
         rag_service = get_rag_service()
@@ -146,8 +294,8 @@ async def conversational_rag(
         # Convert knowledge_base enum to boolean
         use_knowledge_base = (knowledge_base == KnowledgeBaseMode.YES)
         
-        # Process the chat request
-        result = rag_service.chat(
+        # Process the chat request (LLM, Pinecone and cache calls don't block the event loop)
+        result = await rag_service.achat(
             query=query,
             session_id=session_id,
             mode=mode,
@@ -162,11 +310,12 @@ async def conversational_rag(
             mode=mode,
             knowledge_base_used=use_knowledge_base,
             retrieved_chunks=result.get("retrieved_chunks", 0),
-            booking_created=result.get("booking_created", False)
+            booking_created=result.get("booking_created", False),
+            cache_hit=result.get("cache_hit", False)
         )
         
     except Exception as e:
-        print(f"Error in conversational RAG: {e}")
+        logger.exception("Error in conversational RAG")
         raise HTTPException(
             status_code=500,
             detail=f"Error processing chat request: {str(e)}"
@@ -4,9 +4,10 @@ This ensures that request data (like a chat message) and response data
 (like the LLM's answer) strictly conform to a defined JSON structure.'''
 
 from enum import Enum
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, Enum as SQLEnum
+from sqlalchemy import String, Integer, DateTime, Enum as SQLEnum, func
+from sqlalchemy.orm import Mapped, mapped_column
 from app.core.db import Base
 from typing import Optional, List
 
@@ -17,16 +18,27 @@ class ChunkingStrategy(str, Enum):
     FIXED = "fixed"         # Simple, reliable, consistent chunk size
     SEMANTIC = "semantic"   # Context-preserving, better quality for RAG
 
+class DocumentStatus(str, Enum):
+    """
+    Processing state of an uploaded document (ingestion runs in the background).
+    """
+    PENDING = "pending"     # Accepted, still being extracted/embedded
+    READY = "ready"         # Chunks stored in Pinecone, searchable
+    FAILED = "failed"       # Ingestion failed, no chunks stored
+
 class IngestionResponse(BaseModel):
     """
-    Response model for the document ingestion endpoint.
+    Response model for the document ingestion and document status endpoints.
     """
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     message: str
     filename: str
     document_id: str
     chunking_strategy: ChunkingStrategy
-    extracted_text_length: int
-    num_chunks: int
+    status: DocumentStatus
+    extracted_text_length: Optional[int] = None  # Known once ingestion has finished
+    num_chunks: Optional[int] = None
 
 # --- Document Metadata Model for DB Storage (SQLAlchemy) ---
 
@@ -36,12 +48,14 @@ class DocumentMetadata(Base):
     """
     __tablename__ = "documents"
 
-    document_id = Column(String, primary_key=True, index=True)
-    filename = Column(String, nullable=False)
-    chunking_strategy = Column(SQLEnum(ChunkingStrategy), nullable=False)
-    num_chunks = Column(Integer, nullable=False)
-    file_size = Column(Integer, nullable=False)
-    upload_timestamp = Column(DateTime, default=datetime.utcnow)
+    document_id: Mapped[str] = mapped_column(String(26), primary_key=True, index=True)  # ULID
+    filename: Mapped[str] = mapped_column(String, nullable=False)
+    chunking_strategy: Mapped[ChunkingStrategy] = mapped_column(SQLEnum(ChunkingStrategy), nullable=False)
+    num_chunks: Mapped[int] = mapped_column(Integer, nullable=False)
+    file_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    upload_timestamp: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)  # Set by Postgres on INSERT
+    status: Mapped[DocumentStatus] = mapped_column(SQLEnum(DocumentStatus), nullable=False, default=DocumentStatus.READY)
+    extracted_text_length: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Set when ingestion finishes
 
 
 # --- Conversational RAG Models ---
@@ -73,12 +87,15 @@ class ChatResponse(BaseModel):
     """
     Response model for conversational RAG endpoint.
     """
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     response: str
     session_id: str
     mode: ConversationMode
     knowledge_base_used: bool
     retrieved_chunks: Optional[int] = 0
     booking_created: Optional[bool] = False
+    cache_hit: Optional[bool] = False  # True when the answer was served from the LLM cache
 
 # --- Interview Booking Model for DB Storage (SQLAlchemy) ---
 
@@ -89,10 +106,10 @@ class InterviewBooking(Base):
     """
     __tablename__ = "interview_bookings"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String, nullable=False)
-    email = Column(String, nullable=False)
-    date = Column(String, nullable=False)  # Store as string (e.g., "2025-11-25")
-    time = Column(String, nullable=False)  # Store as string (e.g., "14:00")
-    created_at = Column(DateTime, default=datetime.utcnow)
-    session_id = Column(String, nullable=True)  # Track which conversation created this booking
\ No newline at end of file
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    email: Mapped[str] = mapped_column(String, nullable=False)
+    date: Mapped[str] = mapped_column(String, nullable=False)  # Store as string (e.g., "2025-11-25")
+    time: Mapped[str] = mapped_column(String, nullable=False)  # Store as string (e.g., "14:00")
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow)
+    session_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Track which conversation created this booking
\ No newline at end of file
@@ -4,13 +4,17 @@ Most importantly, it defines the get_db function, which FastAPI
 uses as a Dependency to provide a fresh, managed database connection for every request.
 '''
 
+import logging
 import os
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from pinecone.grpc import PineconeGRPC
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, DeclarativeBase
 import redis
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 
@@ -25,13 +29,16 @@ _pc = None  # Pinecone client for inference API
 if PINECONE_API_KEY:
     try:
         # Initialize Pinecone client internally (prefixed with _)
-        _pc = Pinecone(api_key=PINECONE_API_KEY)
+        # The gRPC client sends vectors as protobuf over multiplexed HTTP/2 streams,
+        # so concurrent upsert batches and queries share one connection.
+        # It also exposes the same inference API as the REST client.
+        _pc = PineconeGRPC(api_key=PINECONE_API_KEY)
         # Connect to the specific index
         pinecone_index = _pc.Index(PINECONE_INDEX_NAME)
     except Exception as e:
-        print(f"Error initializing Pinecone: {e}")
+        logger.error("Error initializing Pinecone: %s", e)
 else:
-    print("Warning: PINECONE_API_KEY not found in environment variables.")
+    logger.warning("PINECONE_API_KEY not found in environment variables.")
 
 
 # --- 2. Neon PostgreSQL Setup ---
@@ -41,24 +48,37 @@ DATABASE_URL = os.getenv("DATABASE_URL") or os.getenv("NEON_DB_URL")
 # 'ndb' object interface for neon postgres (SQLAlchemy Engine)
 ndb = None
 SessionLocal = None
-Base = declarative_base()
+
+
+class Base(DeclarativeBase):
+    """Declarative base for all SQLAlchemy 2.0 typed models."""
+    pass
+
 
 if DATABASE_URL:
     try:
         # Create SQLAlchemy engine
         # ndb represents the connection pool/engine
-        ndb = create_engine(DATABASE_URL)
+        # Neon suspends idle connections, so check them before use and recycle them
+        # before they go stale; the pool is sized for concurrent threadpool workers
+        ndb = create_engine(
+            DATABASE_URL,
+            pool_size=20,
+            max_overflow=10,
+            pool_pre_ping=True,
+            pool_recycle=300
+        )
         
         # Create SessionLocal class for creating sessions
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=ndb)
         
-        # Note: Table creation will happen in main.py after all models are imported
-        # to avoid circular import issues
+        # Note: Table creation happens in create_tables() below, which imports the
+        # models itself to avoid circular import issues
         
     except Exception as e:
-        print(f"Error connecting to Neon DB: {e}")
+        logger.error("Error connecting to Neon DB: %s", e)
 else:
-    print("Warning: DATABASE_URL or NEON_DB_URL not found in environment variables.")
+    logger.warning("DATABASE_URL or NEON_DB_URL not found in environment variables.")
 
 
 def get_db():
@@ -78,6 +98,62 @@ def get_db():
         db.close()
 
 
+# Application-wide key for the Postgres advisory lock that serializes schema creation
+SCHEMA_LOCK_KEY = 7245130
+
+# Brings a 'documents' table created by an earlier version up to the current model.
+# create_all never alters existing tables, so these run after it; each statement is
+# idempotent and a no-op on a freshly created schema.
+SCHEMA_MIGRATIONS = (
+    # Enum type for documents.status (labels are the DocumentStatus member names)
+    """
+    DO $$ BEGIN
+        CREATE TYPE documentstatus AS ENUM ('PENDING', 'READY', 'FAILED');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+    # Documents stored before background ingestion were fully processed
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS status documentstatus NOT NULL DEFAULT 'READY'",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS extracted_text_length INTEGER",
+    # upload_timestamp is now filled in by Postgres and required
+    "ALTER TABLE documents ALTER COLUMN upload_timestamp SET DEFAULT now()",
+    "UPDATE documents SET upload_timestamp = now() WHERE upload_timestamp IS NULL",
+    "ALTER TABLE documents ALTER COLUMN upload_timestamp SET NOT NULL",
+)
+
+
+def create_tables() -> None:
+    """
+    Creates any missing database tables, then applies SCHEMA_MIGRATIONS to existing ones.
+    The transaction holds a Postgres advisory lock, so when several workers start at
+    once only one runs the DDL; the others wait and then find the tables in place.
+    """
+    # Import models to register them with Base (they import Base from this module)
+    from app.api import models  # noqa: F401
+    
+    with ndb.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        Base.metadata.create_all(bind=conn)
+        for statement in SCHEMA_MIGRATIONS:
+            conn.execute(text(statement))
+
+
+@contextmanager
+def session_scope():
+    """
+    Context manager for a short-lived DB session outside the request dependency.
+    Used by work dispatched to threads, since a Session must not be shared across threads.
+    """
+    if SessionLocal is None:
+        raise RuntimeError("Database connection (ndb) is not initialized.")
+        
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 # --- 3. Redis Setup (for conversational memory) ---
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
@@ -85,16 +161,21 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 redis_client = None
 
 try:
-    redis_client = redis.from_url(
+    # Bounded pool shared by all request threads: callers wait up to 5s for a free
+    # connection instead of opening new ones. redis-py parses replies with hiredis when installed.
+    redis_pool = redis.BlockingConnectionPool.from_url(
         REDIS_URL,
-        decode_responses=True,  # Automatically decode responses to strings
+        max_connections=32,
+        timeout=5,
+        decode_responses=True,  # Automatically decode responses to strings (must be set on the pool)
         socket_connect_timeout=5,
-        socket_timeout=5
+        socket_timeout=5,
+        socket_keepalive=True
     )
+    redis_client = redis.Redis(connection_pool=redis_pool)
     # Test connection
     redis_client.ping()
-    print(f"✅ Redis connected successfully")
+    logger.info("Redis connected successfully")
 except Exception as e:
-    print(f"⚠️  Warning: Could not connect to Redis: {e}")
-    print("   Conversational memory will not be available.")
+    logger.warning("Could not connect to Redis: %s. Conversational memory will not be available.", e)
     redis_client = None
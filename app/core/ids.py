@@ -0,0 +1,12 @@
+'''
+ID Generation:
+Generates the unique IDs used for ingested documents.
+ULIDs are time-sortable, so new rows land at the end of the primary key B-tree
+(sequential inserts instead of random page writes as with uuid4).'''
+
+from ulid import ULID
+
+
+def new_id() -> str:
+    """Return a new 26-character ULID (Crockford base32, lexicographically time-ordered)."""
+    return str(ULID())
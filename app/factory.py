@@ -0,0 +1,92 @@
+'''
+Application factory:
+Builds the FastAPI instance, wires the lifespan (schema creation, shared clients,
+warm-up) and registers the two API routers. main.py is only the entry point
+that calls create_app(), so the app, engine and router graph exist once per process.'''
+
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+from app.api import endpoints
+from app.core.db import create_tables, ndb
+from app.services.llm_wrapper import get_async_client, close_async_client
+from app.services.document_service import PDF_POOL
+from app.services.llm_service import get_rag_service
+
+logger = logging.getLogger(__name__)
+
+# Tables are only created at startup when RUN_DB_BOOTSTRAP=1 (set for a one-shot
+# migration job); regular workers skip the DDL entirely. See scripts/bootstrap_db.py.
+RUN_DB_BOOTSTRAP = os.getenv("RUN_DB_BOOTSTRAP") == "1"
+
+
+def warm_up_rag_service() -> None:
+    """Builds the RAG service singleton so the first chat request doesn't pay for it."""
+    try:
+        get_rag_service()
+    except Exception as e:
+        logger.warning("Could not initialize RAG service: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create database tables (if enabled) and open shared clients on startup; close them on shutdown."""
+    # Schema DDL is blocking I/O, so it runs in a worker thread
+    if ndb is not None and RUN_DB_BOOTSTRAP:
+        await asyncio.to_thread(create_tables)
+    # One keep-alive HTTP client per worker for all Groq calls
+    get_async_client()
+    # Build the RAG service in the background so the app starts serving right away;
+    # a chat request arriving first simply builds it itself
+    threading.Thread(target=warm_up_rag_service, daemon=True).start()
+    yield
+    await close_async_client()
+    PDF_POOL.shutdown()
+
+
+def create_app() -> FastAPI:
+    """
+    Creates the FastAPI application with its middleware and routers.
+
+    Returns:
+        The configured FastAPI instance.
+    """
+    app = FastAPI(
+        title="RAGTask Backend API",
+        description="Two REST APIs: 1) Document Ingestion API, 2) Conversational RAG API with Redis memory and interview booking.",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse  # orjson encodes responses much faster than stdlib json
+    )
+
+    # Reject oversized uploads before any body bytes are buffered
+    @app.middleware("http")
+    async def reject_oversized_uploads(request: Request, call_next):
+        """
+        Rejects document uploads whose Content-Length exceeds the limit with 413,
+        before the multipart body is received and spooled by the form parser.
+        """
+        if request.url.path == "/documents/upload/":
+            content_length = request.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > endpoints.MAX_UPLOAD_BYTES:
+                return ORJSONResponse(
+                    status_code=413,
+                    content={"detail": f"File too large. Maximum upload size is {endpoints.MAX_UPLOAD_BYTES} bytes."}
+                )
+        return await call_next(request)
+
+    # ============================================
+    # Register the two main API routers
+    # ============================================
+
+    # API 1: Document Ingestion (POST /documents/upload/)
+    app.include_router(endpoints.document_router)
+
+    # API 2: Conversational RAG (POST /RAG/chat)
+    app.include_router(endpoints.rag_router)
+
+    return app
@@ -3,14 +3,46 @@ Contains the functions for the first API task:
 receiving a file, extracting text, implementing the two chunking strategies, 
 calling the embedding model, and saving the document metadata via db.py.'''
 
-import io
+import logging
 import os
-from typing import Literal, List
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain, repeat
+from typing import BinaryIO, Dict, Iterable, Iterator, Literal, List, Optional, Tuple
 from pypdf import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app.api.models import ChunkingStrategy, DocumentMetadata
+from app.api.models import ChunkingStrategy, DocumentMetadata, DocumentStatus
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
-from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _default_pdf_pool_size() -> int:
+    """
+    Splits the CPUs this process may run on (its affinity mask, which honours
+    container cpusets) between the WEB_CONCURRENCY uvicorn workers, so that the
+    workers together start about one parser process per CPU.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    web_workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    return max(1, cpus // max(1, web_workers))
+
+
+# Process pool for CPU-heavy text extraction, so PDF parsing neither blocks the
+# event loop nor competes for the GIL. Worker processes start on first use.
+# Each uvicorn worker has its own pool; PDF_POOL_WORKERS overrides the per-worker size.
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS") or _default_pdf_pool_size())
+PDF_POOL = ProcessPoolExecutor(max_workers=PDF_POOL_WORKERS)
+
+# PDF extraction strategy by page count: (max pages, strategy, pages per pool task).
+# The first matching rule wins. Small PDFs are cheaper to parse in place than to
+# ship to the pool; very large ones use bigger tasks to cut inter-process round-trips.
+PDF_EXTRACTION_RULES = (
+    (10, "sequential", 0),
+    (500, "processes", 8),
+    (None, "processes", 32),
+)
 
 
 def save_document_metadata(
@@ -19,10 +51,13 @@ def save_document_metadata(
     filename: str,
     chunking_strategy: ChunkingStrategy,
     num_chunks: int,
-    file_size: int
-) -> DocumentMetadata:
+    file_size: int,
+    status: DocumentStatus = DocumentStatus.READY
+) -> None:
     """
     Saves the document metadata to the Neon PostgreSQL database.
+    Uses a single bulk-style INSERT statement, avoiding the ORM unit-of-work flush
+    and the follow-up SELECT a refresh would need. upload_timestamp is filled in by the database.
 
     Args:
         db: The SQLAlchemy database session.
@@ -31,22 +66,162 @@ def save_document_metadata(
         chunking_strategy: The strategy used for chunking.
         num_chunks: The total number of chunks generated.
         file_size: The size of the file in bytes.
+        status: The processing state of the document.
+    """
+    payload = {
+        "document_id": document_id,
+        "filename": filename,
+        "chunking_strategy": chunking_strategy,
+        "num_chunks": num_chunks,
+        "file_size": file_size,
+        "status": status
+    }
+    db.execute(insert(DocumentMetadata), [payload])
+    db.commit()
 
-    Returns:
-        The created DocumentMetadata instance.
-    """
-    new_doc = DocumentMetadata(
-        document_id=document_id,
-        filename=filename,
-        chunking_strategy=chunking_strategy,
-        num_chunks=num_chunks,
-        file_size=file_size,
-        upload_timestamp=datetime.utcnow()
+
+def update_document_status(
+    db: Session,
+    document_id: str,
+    status: DocumentStatus,
+    num_chunks: int,
+    extracted_text_length: Optional[int] = None
+) -> None:
+    """
+    Records the outcome of a document's background ingestion.
+
+    Args:
+        db: The SQLAlchemy database session.
+        document_id: The unique ID of the document.
+        status: The new processing state.
+        num_chunks: The total number of chunks generated.
+        extracted_text_length: The length of the extracted text, if extraction finished.
+    """
+    db.execute(
+        update(DocumentMetadata)
+        .where(DocumentMetadata.document_id == document_id)
+        .values(status=status, num_chunks=num_chunks, extracted_text_length=extracted_text_length)
     )
-    db.add(new_doc)
     db.commit()
-    db.refresh(new_doc)
-    return new_doc
+
+
+def get_document_metadata(db: Session, document_id: str) -> Optional[DocumentMetadata]:
+    """
+    Looks up a document's metadata row.
+
+    Args:
+        db: The SQLAlchemy database session.
+        document_id: The unique ID of the document.
+
+    Returns:
+        The DocumentMetadata row, or None if the document does not exist.
+    """
+    return db.get(DocumentMetadata, document_id)
+
+
+CHUNKING_CONFIG = {
+    # Fixed-size chunking: Simple, consistent size
+    # We use a larger chunk size with some overlap to maintain context across boundaries
+    ChunkingStrategy.FIXED: {
+        "chunk_size": 1000,
+        "chunk_overlap": 200,
+        "separators": ["\n\n", "\n", " ", ""] # Standard separators
+    },
+    # Semantic/Recursive chunking: Tries to keep related text together
+    # We use a smaller chunk size but prioritize splitting on paragraph/sentence boundaries
+    # This is better for retrieval as it preserves the "meaning" of a section
+    ChunkingStrategy.SEMANTIC: {
+        "chunk_size": 500,
+        "chunk_overlap": 50,
+        "separators": ["\n\n", "\n", ".", "?", "!", " ", ""] # Prioritize sentence endings
+    },
+}
+
+# Splitters are built once at import time and shared by all requests
+# (split_text keeps no state between calls)
+_SPLITTERS = {
+    strategy: RecursiveCharacterTextSplitter(**config)
+    for strategy, config in CHUNKING_CONFIG.items()
+}
+
+# Streaming chunker: split the buffered text once it holds this many chunks' worth
+STREAM_FLUSH_CHUNKS = 8
+
+# Post-split merge thresholds, relative to the strategy's chunk_size
+MERGE_FACTOR = 1.1      # Adjacent chunks are merged while the result stays within this size
+MAX_SIZE_FACTOR = 1.15  # Hard ceiling; larger chunks are split again
+MIN_CHUNK_CHARS = 100   # Chunks shorter than this are folded into a neighbour
+
+
+def _locate_chunks(text: str, chunks: List[str], max_overlap: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Finds each splitter chunk in the text it was split from, as (start, end) offsets.
+    The splitter keeps separators and only strips whitespace, so every chunk is a
+    substring of the text, starting at most max_overlap characters before the previous one ends.
+    Returns None if a chunk cannot be found.
+    """
+    spans = []
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        if start == -1:
+            return None
+        end = start + len(chunk)
+        spans.append((start, end))
+        cursor = max(start + 1, end - max_overlap)
+    return spans
+
+
+def _merge_small_chunks(
+    text: str,
+    chunks: List[str],
+    splitter: RecursiveCharacterTextSplitter,
+    chunk_size: int,
+    chunk_overlap: int
+) -> List[str]:
+    """
+    Merges the splitter's output so fewer, fuller chunks get embedded.
+    Chunks are merged as spans of the source text, so a merged chunk is exactly the
+    original text it covers: the overlap is not repeated, and separators
+    (paragraph breaks, sentence punctuation) are kept as they were.
+
+    1. Greedily merges adjacent chunks while the result fits in MERGE_FACTOR * chunk_size.
+    2. Re-splits any chunk above MAX_SIZE_FACTOR * chunk_size.
+    3. Folds chunks under MIN_CHUNK_CHARS into the previous chunk if that stays under the ceiling.
+    """
+    spans = _locate_chunks(text, chunks, chunk_overlap)
+    if spans is None:
+        # Should not happen; keep the splitter's output unmerged rather than guess
+        return chunks
+
+    merge_limit = int(chunk_size * MERGE_FACTOR)
+    max_size = int(chunk_size * MAX_SIZE_FACTOR)
+
+    merged = []
+    for start, end in spans:
+        if merged and end - merged[-1][0] <= merge_limit:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            continue
+        merged.append((start, end))
+
+    sized = []
+    for start, end in merged:
+        if end - start > max_size:
+            sub_spans = _locate_chunks(text[start:end], splitter.split_text(text[start:end]), chunk_overlap)
+            if sub_spans is not None:
+                sized.extend((start + sub_start, start + sub_end) for sub_start, sub_end in sub_spans)
+                continue
+        sized.append((start, end))
+
+    result = []
+    for start, end in sized:
+        if result and (end - start < MIN_CHUNK_CHARS or result[-1][1] - result[-1][0] < MIN_CHUNK_CHARS):
+            if end - result[-1][0] <= max_size:
+                result[-1] = (result[-1][0], max(result[-1][1], end))
+                continue
+        result.append((start, end))
+
+    return [text[start:end] for start, end in result]
 
 
 def chunk_text(text: str, strategy: ChunkingStrategy) -> List[str]:
@@ -63,84 +238,202 @@ def chunk_text(text: str, strategy: ChunkingStrategy) -> List[str]:
     if not text:
         return []
 
-    if strategy == ChunkingStrategy.FIXED:
-        # Fixed-size chunking: Simple, consistent size
-        # We use a larger chunk size with some overlap to maintain context across boundaries
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""] # Standard separators
-        )
-        return splitter.split_text(text)
-
-    elif strategy == ChunkingStrategy.SEMANTIC:
-        # Semantic/Recursive chunking: Tries to keep related text together
-        # We use a smaller chunk size but prioritize splitting on paragraph/sentence boundaries
-        # This is better for retrieval as it preserves the "meaning" of a section
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", ".", "?", "!", " ", ""] # Prioritize sentence endings
-        )
-        return splitter.split_text(text)
-    
-    else:
+    splitter = _SPLITTERS.get(strategy)
+    if splitter is None:
         # Fallback (should not happen if Enum is used correctly)
         return [text]
 
+    config = CHUNKING_CONFIG[strategy]
 
-def extract_text_from_file_bytes(
-    file_bytes: bytes, 
-    file_extension: Literal['.pdf', '.txt']
-) -> str:
+    # Text that already fits in a single chunk needs no splitting; the splitter would
+    # return it whitespace-stripped, so skip its separator scan and do the same here
+    if len(text) <= config["chunk_size"]:
+        stripped = text.strip()
+        return [stripped] if stripped else []
+
+    # Merge the splitter's boundary fragments so each embedding call covers more text
+    return _merge_small_chunks(
+        text, splitter.split_text(text), splitter, config["chunk_size"], config["chunk_overlap"]
+    )
+
+
+def decode_text_stream(file_stream: BinaryIO) -> str:
     """
-    Extracts text content from file bytes based on the file extension.
+    Decodes the content of a plain text file.
+    (PDFs are read page by page from disk by PDF_EXTRACTOR instead.)
 
     Args:
-        file_bytes: The raw bytes of the uploaded file (from await UploadFile.read()).
-        file_extension: The validated extension ('.pdf' or '.txt').
+        file_stream: A binary stream of the uploaded .txt file.
 
     Returns:
-        The extracted text content as a single string.
-    
-    Raises:
-        ValueError: If the file is a PDF but text extraction fails.
+        The decoded text content as a single string.
+    """
+    file_bytes = file_stream.read()
+    try:
+        # We try UTF-8 first, then fall back to a common encoding if it fails
+        return file_bytes.decode('utf-8')
+    except UnicodeDecodeError:
+        logger.warning("UTF-8 decoding failed, attempting ISO-8859-1 (Latin-1) fallback.")
+        return file_bytes.decode('iso-8859-1', errors='ignore')
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extracts the text of PDF pages [start, stop).
+    Each task opens the file once for its whole page range and releases the reader
+    when it returns, so pool workers keep no PDF in memory between tasks.
+    This is a top-level function so it can be submitted to PDF_POOL.
+    """
+    reader = PdfReader(file_path)
+    return [reader.pages[page_index].extract_text() or "" for page_index in range(start, stop)]
+
+
+class SmartPDFExtractor:
+    """
+    Extracts text from PDFs on disk, choosing sequential or page-parallel
+    (PDF_POOL) extraction from the document's page count.
     """
     
-    if file_extension == '.txt':
-        # For text files, simply decode the bytes
-        try:
-            # We try UTF-8 first, then fall back to a common encoding if it fails
-            return file_bytes.decode('utf-8')
-        except UnicodeDecodeError:
-            print("Warning: UTF-8 decoding failed, attempting ISO-8859-1 (Latin-1) fallback.")
-            return file_bytes.decode('iso-8859-1', errors='ignore')
+    def __init__(self, rules: tuple = PDF_EXTRACTION_RULES):
+        self.rules = rules
+    
+    def choose_strategy(self, num_pages: int) -> Tuple[str, int]:
+        """Returns (strategy, pages per pool task) for a PDF with num_pages pages."""
+        for max_pages, strategy, pages_per_task in self.rules:
+            if max_pages is None or num_pages <= max_pages:
+                return strategy, pages_per_task
+        return "sequential", 0
+    
+    def iter_pages(self, file_path: str) -> Iterator[str]:
+        """
+        Yields the non-empty page texts of a PDF file in page order.
 
-    elif file_extension == '.pdf':
+        Raises:
+            ValueError: If text extraction fails.
+        """
         try:
-            # Wrap the bytes in an in-memory stream object
-            pdf_stream = io.BytesIO(file_bytes)
-            
-            # Create a PdfReader instance
-            reader = PdfReader(pdf_stream)
-            
-            extracted_text = []
+            # The reader opened to count pages is reused for sequential extraction
+            reader = PdfReader(file_path)
+            num_pages = len(reader.pages)
+            strategy, pages_per_task = self.choose_strategy(num_pages)
             
-            # Iterate through all pages and extract text
-            for page in reader.pages:
-                page_text = page.extract_text()
+            if strategy == "sequential":
+                page_texts = (page.extract_text() for page in reader.pages)
+            else:
+                # One task per range of pages_per_task pages; the parent's reader isn't needed
+                del reader
+                starts = range(0, num_pages, pages_per_task)
+                # map() yields results in page order regardless of which worker finished first
+                page_ranges = PDF_POOL.map(
+                    _extract_pdf_pages,
+                    repeat(file_path, len(starts)),
+                    starts,
+                    (min(start + pages_per_task, num_pages) for start in starts)
+                )
+                page_texts = chain.from_iterable(page_ranges)
+            for page_text in page_texts:
                 if page_text:
-                    extracted_text.append(page_text)
-            
-            # Join all extracted text into one large string
-            return "\n\n".join(extracted_text)
+                    yield page_text
         
+        except BrokenProcessPool:
+            raise
         except Exception as e:
             # Catch any exception during PDF parsing (e.g., corrupted file)
             raise ValueError(f"Failed to extract text from PDF: {e}")
 
-    else:
+
+PDF_EXTRACTOR = SmartPDFExtractor()
+
+
+def iter_page_texts(
+    file_path: str,
+    file_extension: Literal['.pdf', '.txt']
+) -> Iterator[str]:
+    """
+    Yields the text of a file on disk piece by piece: one item per non-empty
+    PDF page, or the whole decoded file for .txt.
+
+    Args:
+        file_path: Path to the uploaded file.
+        file_extension: The validated extension ('.pdf' or '.txt').
+    """
+    if file_extension == '.pdf':
+        yield from PDF_EXTRACTOR.iter_pages(file_path)
+        return
+    
+    if file_extension != '.txt':
         # This case should ideally not be reached due to prior validation in endpoints.py
         raise ValueError(f"Unsupported file extension for extraction: {file_extension}")
     
+    with open(file_path, 'rb') as file_stream:
+        text = decode_text_stream(file_stream)
+    if text:
+        yield text
+
+
+def iter_chunks(page_texts: Iterable[str], strategy: ChunkingStrategy) -> Iterator[str]:
+    """
+    Chunks a stream of page texts, yielding chunks as soon as they are complete,
+    so the full document text is never held in memory at once.
+    Pages are buffered until STREAM_FLUSH_CHUNKS chunks' worth of text is available;
+    the last (possibly incomplete) chunk of each split is carried over and split
+    again together with the following pages.
+
+    Args:
+        page_texts: The document's text, in order (pages are joined by blank lines).
+        strategy: The chunking strategy (FIXED or SEMANTIC).
+    """
+    splitter = _SPLITTERS.get(strategy)
+    if splitter is None:
+        # Fallback (should not happen if Enum is used correctly)
+        yield from chunk_text("\n\n".join(page_texts), strategy)
+        return
+
+    config = CHUNKING_CONFIG[strategy]
+    flush_size = config["chunk_size"] * STREAM_FLUSH_CHUNKS
+
+    buffer = ""
+    for page_text in page_texts:
+        buffer = f"{buffer}\n\n{page_text}" if buffer else page_text
+        if len(buffer) >= flush_size:
+            pieces = _merge_small_chunks(
+                buffer, splitter.split_text(buffer), splitter, config["chunk_size"], config["chunk_overlap"]
+            )
+            yield from pieces[:-1]
+            buffer = pieces[-1] if pieces else ""
+
+    yield from chunk_text(buffer, strategy)
+
+
+def iter_chunks_from_file_path(
+    file_path: str,
+    file_extension: Literal['.pdf', '.txt'],
+    strategy: ChunkingStrategy,
+    stats: Dict[str, int]
+) -> Iterator[str]:
+    """
+    Extracts and chunks a file on disk as one streaming pipeline
+    (pages -> chunks), yielding each chunk as soon as it is complete, so neither
+    the full document text nor the full chunk list is held in memory.
+    PDF pages may be fanned out to PDF_POOL and waited on, so this should be
+    consumed in a worker thread rather than on the event loop.
+
+    Args:
+        file_path: Path to the uploaded file.
+        file_extension: The validated extension ('.pdf' or '.txt').
+        strategy: The chunking strategy (FIXED or SEMANTIC).
+        stats: Updated in place as the file streams through: "num_chunks" (chunks
+               yielded so far) and "text_length" (length of the text extracted so far).
+    """
+    stats["num_chunks"] = 0
+    stats["text_length"] = 0
+
+    def counted(page_texts: Iterable[str]) -> Iterator[str]:
+        for i, page_text in enumerate(page_texts):
+            # Pages are separated by a blank line, as in iter_chunks
+            stats["text_length"] += len(page_text) + (2 if i else 0)
+            yield page_text
 
+    for chunk in iter_chunks(counted(iter_page_texts(file_path, file_extension)), strategy):
+        stats["num_chunks"] += 1
+        yield chunk
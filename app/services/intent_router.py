@@ -0,0 +1,50 @@
+'''
+Intent Router:
+Answers high-frequency, deterministic messages (greetings, thanks, help, goodbye)
+with canned responses so they never reach the LLM.
+All patterns are compiled into a single regex at import time, so every
+query is matched against the whole intent set in one pass.'''
+
+import re
+from typing import Optional
+
+
+# Intent name -> (pattern matching the whole message, canned answer)
+FAQ_INTENTS = {
+    "greeting": (
+        r"(?:hi|hello|hey|good (?:morning|afternoon|evening))(?: there)?",
+        "Hello! I can answer questions about your uploaded documents or help you book an interview. How can I help?"
+    ),
+    "thanks": (
+        r"(?:thanks|thank you|thx)(?: (?:so|very) much)?",
+        "You're welcome! Let me know if there's anything else I can help with."
+    ),
+    "help": (
+        r"help|what can you do",
+        "I can answer questions using your uploaded documents (set knowledge_base to 'yes') "
+        "and book interviews - just tell me your full name, email, date (YYYY-MM-DD) and time (HH:MM)."
+    ),
+    "goodbye": (
+        r"bye|goodbye|see you",
+        "Goodbye! Feel free to come back any time."
+    ),
+}
+
+# One anchored alternation with a named group per intent; match.lastgroup is the intent
+_INTENT_RE = re.compile(
+    r"^\s*(?:"
+    + "|".join(f"(?P<{name}>{pattern})" for name, (pattern, _) in FAQ_INTENTS.items())
+    + r")\s*[!.?]*\s*$",
+    re.IGNORECASE
+)
+
+
+def match_intent(query: str) -> Optional[str]:
+    """
+    Returns the canned answer if the whole query is a known FAQ intent, else None.
+    Only complete matches count, so "hi, I'd like to book an interview" still goes to the LLM.
+    """
+    match = _INTENT_RE.match(query)
+    if match is None:
+        return None
+    return FAQ_INTENTS[match.lastgroup][1]
@@ -0,0 +1,222 @@
+'''
+LLM Answer Cache:
+Sits in front of the Groq LLM for the conversational RAG flow.
+Exact repeats of a question are served from an in-process LRU, then Redis,
+and near-duplicate questions are matched by embedding
+similarity in a dedicated Pinecone namespace, so cache hits skip the Groq round-trip.'''
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .vector_store_manager import embed_query
+from app.core.db import redis_client, pinecone_index
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_NAMESPACE = "llm-cache"       # Pinecone namespace holding (embedding, answer) pairs
+SIMILARITY_THRESHOLD = 0.95         # Minimum cosine score for a near-duplicate hit
+CACHE_TTL_SECONDS = 3600 * 24       # Cached answers expire after 24 hours
+PURGE_INTERVAL_SECONDS = 3600       # How often each process deletes expired semantic entries
+
+
+class LLMCache:
+    """
+    Two-level cache for LLM answers keyed on the user's question.
+
+    1. Exact store: sha256 of the normalized question (plus scope), kept in a
+       per-process LRU in front of Redis (hits skip the Redis round-trip).
+    2. Semantic store: top-1 nearest neighbour in the 'llm-cache' Pinecone namespace.
+       Each vector carries an 'expires_at' timestamp; expired vectors are never
+       matched and are periodically deleted.
+
+    A scope string partitions the cache so answers are only reused between
+    requests that would have produced the same answer (e.g. same session).
+    Semantic matches are additionally limited to the asking session: a similarity
+    threshold can't tell apart questions that differ only in a name or email, so
+    near-duplicates must never return another user's answer.
+    """
+
+    def __init__(
+        self,
+        namespace: str = CACHE_NAMESPACE,
+        threshold: float = SIMILARITY_THRESHOLD,
+        ttl: int = CACHE_TTL_SECONDS,
+        max_local_entries: int = 512
+    ):
+        self.namespace = namespace
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_local_entries = max_local_entries
+        # In-process exact store: key -> (expiry on the monotonic clock, answer)
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # get/set run in several worker threads at once; the LRU's check-then-move/evict steps must not interleave
+        self._local_lock = threading.Lock()
+        # Monotonic time of the next purge of expired semantic entries
+        self._next_purge = 0.0
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        """Lowercase and collapse whitespace so trivial variations share a key."""
+        return " ".join(query.strip().lower().split())
+
+    def _make_key(self, query: str, scope: str) -> str:
+        """Build the content-addressed cache key for a question within a scope."""
+        raw = f"{scope}|{self._normalize(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[str]:
+        """Look up an unexpired entry in the in-process LRU."""
+        with self._local_lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+
+            expires_at, answer = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+
+            self._local.move_to_end(key)
+            return answer
+
+    def _set_local(self, key: str, answer: str, ttl: int) -> None:
+        """Store an entry in the in-process LRU, evicting the least recently used."""
+        with self._local_lock:
+            self._local[key] = (time.monotonic() + ttl, answer)
+            self._local.move_to_end(key)
+            if len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def _get_exact(self, key: str) -> Optional[str]:
+        """Look up an exact hit in the in-process LRU, then in Redis."""
+        answer = self._get_local(key)
+        if answer is not None or not redis_client:
+            return answer
+
+        # The remaining TTL comes back in the same round-trip, so the local copy expires with Redis
+        with redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(f"llm_cache:{key}")
+            pipe.ttl(f"llm_cache:{key}")
+            answer, ttl = pipe.execute()
+        if answer is not None and ttl > 0:
+            self._set_local(key, answer, ttl)
+        return answer
+
+    def _set_exact(self, key: str, answer: str, ttl: int) -> None:
+        """Store an exact-hit entry in the in-process LRU and Redis for ttl seconds."""
+        self._set_local(key, answer, ttl)
+        if redis_client:
+            redis_client.setex(f"llm_cache:{key}", ttl, answer)
+
+    @staticmethod
+    def _semantic_scope(scope: str, session_id: str) -> str:
+        """The scope used by the semantic store: the exact scope narrowed to one session."""
+        return f"{scope}|semantic_session={session_id}"
+
+    def _get_similar(self, query: str, scope: str) -> Optional[Tuple[str, int]]:
+        """
+        Look up the nearest unexpired cached question in Pinecone.
+        Returns its answer and remaining lifetime in seconds if it is close enough, else None.
+        """
+        if pinecone_index is None:
+            return None
+
+        now = time.time()
+
+        results = pinecone_index.query(
+            # The raw query, as in retrieval, so both share one cached embedding
+            vector=embed_query(query),
+            top_k=1,
+            namespace=self.namespace,
+            filter={"scope": {"$eq": scope}, "expires_at": {"$gt": now}},
+            include_metadata=True,
+            include_values=False
+        )
+
+        matches = results['matches']
+        if not matches or matches[0]['score'] < self.threshold:
+            return None
+
+        metadata = matches[0]['metadata']
+        answer = metadata.get("answer")
+        remaining = int(metadata.get("expires_at", 0) - now)
+        if answer is None or remaining <= 0:
+            return None
+        return answer, remaining
+
+    def _set_similar(self, query: str, answer: str, scope: str) -> None:
+        """Store the question embedding with its answer in the cache namespace."""
+        if pinecone_index is None:
+            return
+
+        pinecone_index.upsert(
+            vectors=[{
+                "id": self._make_key(query, scope),
+                "values": embed_query(query),
+                "metadata": {"answer": answer, "scope": scope, "expires_at": time.time() + self.ttl}
+            }],
+            namespace=self.namespace
+        )
+
+    def _purge_expired(self) -> None:
+        """
+        Delete expired vectors from the cache namespace, at most once per
+        PURGE_INTERVAL_SECONDS per process, so the namespace does not grow without bound.
+        """
+        if pinecone_index is None or time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+
+        try:
+            pinecone_index.delete(
+                filter={"expires_at": {"$lt": time.time()}},
+                namespace=self.namespace
+            )
+        except Exception:
+            logger.exception("Error purging expired LLM cache entries")
+
+    def get(self, query: str, scope: str = "", session_id: str = "") -> Optional[str]:
+        """
+        Return a cached answer for the question, or None on a miss.
+        Exact hits are shared within the scope; near-duplicate hits only within the session.
+        Cache errors are logged and treated as misses.
+        """
+        key = self._make_key(query, scope)
+
+        try:
+            answer = self._get_exact(key)
+            if answer is not None:
+                return answer
+
+            similar = self._get_similar(query, self._semantic_scope(scope, session_id))
+            if similar is None:
+                return None
+
+            # Promote near-duplicate hits so the next identical query is exact;
+            # the copy expires with the original entry rather than getting a fresh TTL
+            answer, remaining = similar
+            self._set_exact(key, answer, remaining)
+            return answer
+        except Exception:
+            logger.exception("Error reading LLM cache")
+            return None
+
+    def set(self, query: str, answer: str, scope: str = "", session_id: str = "") -> None:
+        """
+        Store an answer in both the exact and the semantic store.
+        Makes a Pinecone round-trip, so callers should run it off the response path.
+        """
+        key = self._make_key(query, scope)
+
+        try:
+            self._set_exact(key, answer, self.ttl)
+            self._set_similar(query, answer, self._semantic_scope(scope, session_id))
+        except Exception:
+            logger.exception("Error writing LLM cache")
+
+        self._purge_expired()
@@ -7,17 +7,112 @@ it initializes and runs the Custom RAG Chain, integrates Redis for chat memory,
 binds the Interview Booking Tool (Function Calling) to the LLM, 
 and handles the multi-turn conversational flow.'''
 
+import asyncio
+import hashlib
+import logging
 import json
 import re
+import orjson
+import threading
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from .llm_wrapper import create_groq_llm
+from .llm_cache import LLMCache
+from .intent_router import match_intent
 from .vector_store_manager import search_similar_chunks
 from app.core.db import redis_client
 from app.api.models import InterviewBooking, ConversationMode
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever the RAG prompt templates change, so answers cached under the old prompt are not reused
+PROMPT_VERSION = "2"
+# Character budget for the conversation history included in the prompt
+MAX_HISTORY_PROMPT_CHARS = 4000
+
+BOOKING_KEYWORDS = (
+    "book", "schedule", "appointment", "interview",
+    "meeting", "reserve", "set up", "arrange"
+)
+# One alternation scans for every keyword in a single pass. There are deliberately
+# no word boundaries, so "booking" or "interviews" still match as before.
+_BOOKING_RE = re.compile("|".join(re.escape(keyword) for keyword in BOOKING_KEYWORDS), re.IGNORECASE)
+
+# Cheap pre-checks for booking details; the extraction LLM call only runs once all three appear
+_EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+_DATE_RE = re.compile(r'\b\d{4}-\d{1,2}-\d{1,2}\b')
+_TIME_RE = re.compile(r'\b(?:[01]?\d|2[0-3]):[0-5]\d\b|\b(?:1[0-2]|0?[1-9])\s*[ap]\.?m\b', re.IGNORECASE)
+
+# Reused to pull the booking JSON object out of the extraction response
+_JSON_DECODER = json.JSONDecoder()
+
+# Prompt templates are built once; each request does a single %-substitution
+# (bump PROMPT_VERSION when changing the RAG templates)
+_BOOKING_EXTRACTION_PROMPT = """
+You are a helpful assistant that extracts interview booking information from conversations.
+
+Analyze this conversation and extract the following information if provided:
+- Name (person's full name)
+- Email (valid email address)
+- Date (in YYYY-MM-DD format)
+- Time (in HH:MM format, 24-hour)
+
+If any information is missing or unclear, return "MISSING" for that field.
+
+Conversation:
+%(conversation)s
+
+Return ONLY a JSON object with this exact format (no other text):
+{"name": "...", "email": "...", "date": "...", "time": "..."}
+"""
+
+_PROMPT_WITH_CONTEXT = """You are a helpful AI assistant with access to a knowledge base. Use the provided context to answer questions accurately.
+
+CONVERSATION HISTORY:
+%(history)s
+
+RELEVANT CONTEXT FROM KNOWLEDGE BASE:
+%(context)s
+
+USER QUERY: %(query)s
+
+Instructions:
+- Answer based on the context and conversation history
+- If user wants to book an interview, ONLY ask for these 4 details (don't ask about purpose, company, or topic):
+  1. Full name
+  2. Email address
+  3. Date (YYYY-MM-DD format)
+  4. Time (HH:MM format, 24-hour)
+- Once you have all 4 details, confirm them back to the user
+- Don't ask what the interview is for or who it's with
+- Be conversational and helpful
+- If context doesn't contain relevant information, say so politely
+
+RESPONSE:"""
+
+_PROMPT_NO_CONTEXT = """You are a helpful AI assistant.
+
+CONVERSATION HISTORY:
+%(history)s
+
+USER QUERY: %(query)s
+
+Instructions:
+- Continue the conversation naturally
+- If user wants to book an interview, ONLY collect these 4 details (nothing more):
+  1. Full name
+  2. Email address  
+  3. Date (YYYY-MM-DD format)
+  4. Time (HH:MM format, 24-hour)
+- Don't ask what the interview is for, who it's with, or the topic
+- Once you have all 4 details, confirm them
+- Be friendly and professional
+
+RESPONSE:"""
+
 
 class ConversationalRAGService:
     """
@@ -28,124 +123,143 @@ class ConversationalRAGService:
     def __init__(self):
         """Initialize the LLM and set up system prompts."""
         self.llm = create_groq_llm(temperature=0.7, max_tokens=1024)
+        self.cache = LLMCache()
         self.max_history = 10  # Keep last 10 messages in memory
         
     def _get_redis_key(self, session_id: str) -> str:
-        """Generate Redis key for a session."""
-        return f"chat_history:{session_id}"
+        """Generate Redis key for a session (a LIST with one JSON message per element)."""
+        return f"chat_history_list:{session_id}"
+    
+    def _get_cache_scope(
+        self,
+        session_id: str,
+        mode: ConversationMode,
+        use_knowledge_base: bool,
+        chunk_ids: List[str],
+        history_text: str
+    ) -> str:
+        """
+        Build the LLM cache scope for a request.
+        The scope covers everything besides the query that goes into the prompt:
+        the prompt version, the retrieved chunks (so re-ingesting documents invalidates
+        their answers) and, in CONTINUE mode, the session and a hash of the history
+        included in the prompt, so follow-ups like "why?" are only reused for the same history.
+        """
+        scope = f"v={PROMPT_VERSION}|kb={int(use_knowledge_base)}|chunks={','.join(sorted(chunk_ids))}"
+        if mode == ConversationMode.CONTINUE:
+            history_hash = hashlib.blake2b(history_text.encode("utf-8"), digest_size=16).hexdigest()
+            scope += f"|session={session_id}|history={history_hash}"
+        return scope
     
     def _get_chat_history(self, session_id: str) -> List[Dict[str, str]]:
-        """Retrieve chat history from Redis."""
+        """
+        Retrieve chat history from Redis.
+        The read and the 24h TTL refresh go out in one pipelined round-trip.
+        """
         if not redis_client:
             return []
         
         try:
             key = self._get_redis_key(session_id)
-            history_json = redis_client.get(key)
+            with redis_client.pipeline(transaction=False) as pipe:
+                pipe.lrange(key, -self.max_history, -1)
+                pipe.expire(key, 3600 * 24)
+                messages_json, _ = pipe.execute()
             
-            if history_json:
-                return json.loads(history_json)
-            return []
-        except Exception as e:
-            print(f"Error retrieving chat history: {e}")
+            return [orjson.loads(message) for message in messages_json]
+        except Exception:
+            logger.exception("Error retrieving chat history")
             return []
     
-    def _save_chat_history(self, session_id: str, history: List[Dict[str, str]]) -> None:
-        """Save chat history to Redis with expiration."""
-        if not redis_client:
-            return
+    def _save_chat_turn(self, session_id: str, query: str, response: str, reset: bool = False) -> None:
+        """
+        Append one user/assistant turn to the session's history in Redis.
+        Only the new messages are sent (RPUSH), instead of rewriting the whole history.
         
-        try:
-            key = self._get_redis_key(session_id)
-            # Keep only last N messages to avoid memory bloat
-            trimmed_history = history[-self.max_history:]
-            redis_client.setex(
-                key,
-                3600 * 24,  # Expire after 24 hours
-                json.dumps(trimmed_history)
-            )
-        except Exception as e:
-            print(f"Error saving chat history: {e}")
-    
-    def _clear_chat_history(self, session_id: str) -> None:
-        """Clear chat history from Redis."""
+        Args:
+            session_id: Unique session identifier
+            query: The user's message
+            response: The assistant's answer
+            reset: Drop the previous history first (RESTART mode)
+        """
         if not redis_client:
             return
         
         try:
             key = self._get_redis_key(session_id)
-            redis_client.delete(key)
-        except Exception as e:
-            print(f"Error clearing chat history: {e}")
+            with redis_client.pipeline(transaction=False) as pipe:
+                if reset:
+                    pipe.delete(key)
+                pipe.rpush(
+                    key,
+                    orjson.dumps({"role": "user", "content": query}),
+                    orjson.dumps({"role": "assistant", "content": response})
+                )
+                # Keep only last N messages to avoid memory bloat
+                pipe.ltrim(key, -self.max_history, -1)
+                pipe.expire(key, 3600 * 24)  # Expire after 24 hours
+                pipe.execute()
+        except Exception:
+            logger.exception("Error saving chat history")
     
     def _format_chat_history(self, history: List[Dict[str, str]]) -> str:
-        """Format chat history for LLM context."""
+        """
+        Format chat history for LLM context.
+        Keeps the most recent messages that fit in MAX_HISTORY_PROMPT_CHARS.
+        """
         if not history:
             return "No previous conversation."
         
         formatted = []
-        for msg in history[-6:]:  # Last 6 messages (3 turns)
+        budget = MAX_HISTORY_PROMPT_CHARS
+        for msg in reversed(history[-6:]):  # Last 6 messages (3 turns), newest first
             role = msg.get("role", "unknown")
             content = msg.get("content", "")
-            formatted.append(f"{role.upper()}: {content}")
+            line = f"{role.upper()}: {content}"
+            budget -= len(line) + 1
+            if budget < 0 and formatted:
+                break
+            formatted.append(line)
         
-        return "\n".join(formatted)
+        return "\n".join(reversed(formatted))
     
     def _detect_booking_intent(self, query: str, history: List[Dict[str, str]] = None) -> bool:
         """
         Detect if user wants to book an interview.
         Checks both current query and recent conversation history.
         """
-        booking_keywords = [
-            "book", "schedule", "appointment", "interview",
-            "meeting", "reserve", "set up", "arrange"
-        ]
-        
         # Check current query
-        query_lower = query.lower()
-        if any(keyword in query_lower for keyword in booking_keywords):
+        if _BOOKING_RE.search(query):
             return True
         
-        # Check if recent conversation history mentions booking
+        # Check if recent conversation history mentions booking (last 4 messages)
         if history:
-            # Check last 4 messages for booking context
-            recent_messages = history[-4:] if len(history) > 4 else history
-            for msg in recent_messages:
-                content = msg.get("content", "").lower()
-                if any(keyword in content for keyword in booking_keywords):
-                    return True
+            return any(_BOOKING_RE.search(msg.get("content", "")) for msg in history[-4:])
         
         return False
 
-    def _extract_booking_info(self, conversation: str) -> Optional[Dict[str, str]]:
+    async def _extract_booking_info(self, conversation: str) -> Optional[Dict[str, str]]:
         """
         Use LLM to extract booking information from conversation.
         Returns dict with name, email, date, time or None.
+        Skips the LLM call when the conversation has no email, date or time yet.
         """
-        extraction_prompt = f"""
-You are a helpful assistant that extracts interview booking information from conversations.
-
-Analyze this conversation and extract the following information if provided:
-- Name (person's full name)
-- Email (valid email address)
-- Date (in YYYY-MM-DD format)
-- Time (in HH:MM format, 24-hour)
-
-If any information is missing or unclear, return "MISSING" for that field.
-
-Conversation:
-{conversation}
-
-Return ONLY a JSON object with this exact format (no other text):
-{{"name": "...", "email": "...", "date": "...", "time": "..."}}
-"""
+        if not (
+            _EMAIL_RE.search(conversation) and
+            _DATE_RE.search(conversation) and
+            _TIME_RE.search(conversation)
+        ):
+            return None
+        
+        extraction_prompt = _BOOKING_EXTRACTION_PROMPT % {"conversation": conversation}
         
         try:
-            response = self.llm(extraction_prompt)
-            # Extract JSON from response
-            json_match = re.search(r'\{[^}]+\}', response)
-            if json_match:
-                booking_data = json.loads(json_match.group())
+            response = await self.llm.acall(extraction_prompt)
+            # Extract the first JSON object from the response (a single linear parse,
+            # which also copes with braces or newlines inside values)
+            json_start = response.find('{')
+            if json_start != -1:
+                booking_data, _ = _JSON_DECODER.raw_decode(response, json_start)
                 
                 # Validate all fields are present and not "MISSING"
                 required_fields = ["name", "email", "date", "time"]
@@ -156,39 +270,42 @@ Return ONLY a JSON object with this exact format (no other text):
                     for field in required_fields
                 ):
                     return booking_data
-        except Exception as e:
-            print(f"Error extracting booking info: {e}")
+        except Exception:
+            logger.exception("Error extracting booking info")
         
         return None
     
     def _save_booking(self, booking_data: Dict[str, str], session_id: str, db: Session) -> bool:
-        """Save booking information to database."""
+        """
+        Save booking information to database.
+        Uses a single INSERT statement, skipping the ORM unit-of-work flush.
+        """
         try:
-            booking = InterviewBooking(
-                name=booking_data["name"],
-                email=booking_data["email"],
-                date=booking_data["date"],
-                time=booking_data["time"],
-                session_id=session_id
-            )
-            db.add(booking)
+            payload = {
+                "name": booking_data["name"],
+                "email": booking_data["email"],
+                "date": booking_data["date"],
+                "time": booking_data["time"],
+                "session_id": session_id
+            }
+            db.execute(insert(InterviewBooking), [payload])
             db.commit()
             return True
-        except Exception as e:
-            print(f"Error saving booking: {e}")
+        except Exception:
+            logger.exception("Error saving booking")
             db.rollback()
             return False
     
-    def _retrieve_context(self, query: str, top_k: int = 3) -> Tuple[str, int]:
+    def _retrieve_context(self, query: str, top_k: int = 3) -> Tuple[str, int, List[str]]:
         """
         Retrieve relevant context from Pinecone vector store.
-        Returns formatted context string and count of chunks.
+        Returns formatted context string, count of chunks and the retrieved chunk ids.
         """
         try:
             matches = search_similar_chunks(query, top_k=top_k)
             
             if not matches:
-                return "", 0
+                return "", 0, []
             
             # Format context from retrieved chunks
             context_parts = []
@@ -197,12 +314,24 @@ Return ONLY a JSON object with this exact format (no other text):
                 if text:
                     context_parts.append(f"[Context {i}]: {text}")
             
-            return "\n\n".join(context_parts), len(matches)
-        except Exception as e:
-            print(f"Error retrieving context: {e}")
-            return "", 0
+            return "\n\n".join(context_parts), len(matches), [match["id"] for match in matches]
+        except Exception:
+            logger.exception("Error retrieving context")
+            return "", 0, []
+    
+    async def _aget_chat_history(self, session_id: str, reset: bool) -> List[Dict[str, str]]:
+        """Load chat history in a worker thread (empty when the conversation is being reset)."""
+        if reset:
+            return []
+        return await asyncio.to_thread(self._get_chat_history, session_id)
     
-    def chat(
+    async def _aretrieve_context(self, query: str, use_knowledge_base: bool) -> Tuple[str, int, List[str]]:
+        """Retrieve context in a worker thread (nothing when the knowledge base is off)."""
+        if not use_knowledge_base:
+            return "", 0, []
+        return await asyncio.to_thread(self._retrieve_context, query)
+    
+    async def achat(
         self, 
         query: str, 
         session_id: str, 
@@ -223,12 +352,16 @@ Return ONLY a JSON object with this exact format (no other text):
         Returns:
             Dict with response, metadata, and booking status
         """
-        # Handle restart mode
-        if mode == ConversationMode.RESTART:
-            self._clear_chat_history(session_id)
-            history = []
-        else:
-            history = self._get_chat_history(session_id)
+        # Handle restart mode: start from an empty history. The stored history is
+        # deleted in the same pipeline that saves this turn, so no extra round-trip is needed.
+        reset_history = mode == ConversationMode.RESTART
+        
+        # Load history (Redis) and retrieve context (embed + Pinecone) concurrently:
+        # neither depends on the other, so the turn waits for the slower one only
+        history, (context, num_chunks, chunk_ids) = await asyncio.gather(
+            self._aget_chat_history(session_id, reset_history),
+            self._aretrieve_context(query, use_knowledge_base)
+        )
         
         # Detect booking intent (check query + history)
         is_booking_intent = self._detect_booking_intent(query, history)
@@ -248,19 +381,18 @@ Return ONLY a JSON object with this exact format (no other text):
             
             conversation_text = "\n".join(full_conversation)
             
-            booking_data = self._extract_booking_info(conversation_text)
+            booking_data = await self._extract_booking_info(conversation_text)
             
             if booking_data:
                 # We have complete booking info, save it
-                booking_created = self._save_booking(booking_data, session_id, db)
+                # Runs in a worker thread so the INSERT doesn't block the event loop
+                booking_created = await asyncio.to_thread(self._save_booking, booking_data, session_id, db)
                 
                 if booking_created:
                     response = f"Great! I've scheduled your interview for {booking_data['name']} on {booking_data['date']} at {booking_data['time']}. A confirmation will be sent to {booking_data['email']}."
                     
                     # Update history
-                    history.append({"role": "user", "content": query})
-                    history.append({"role": "assistant", "content": response})
-                    self._save_chat_history(session_id, history)
+                    await asyncio.to_thread(self._save_chat_turn, session_id, query, response, reset_history)
                     
                     return {
                         "response": response,
@@ -268,83 +400,71 @@ Return ONLY a JSON object with this exact format (no other text):
                         "booking_created": True
                     }
         
-        # Regular RAG flow: retrieve context based on knowledge_base setting
-        if use_knowledge_base:
-            context, num_chunks = self._retrieve_context(query)
-        else:
-            context = ""
-            num_chunks = 0
+        # Greetings, thanks and help requests get a canned answer without calling the LLM
+        if not use_knowledge_base and (canned_response := match_intent(query)) is not None:
+            await asyncio.to_thread(self._save_chat_turn, session_id, query, canned_response, reset_history)
+            
+            return {
+                "response": canned_response,
+                "retrieved_chunks": 0,
+                "booking_created": booking_created
+            }
         
-        # Format history for LLM
+        # Format history for LLM (also part of the cache scope in CONTINUE mode)
         history_text = self._format_chat_history(history)
         
+        # Serve repeated questions against the same retrieved chunks from the answer cache
+        # (skips the LLM call). Booking turns depend on the details collected so far,
+        # so they are never cached.
+        cache_scope = self._get_cache_scope(session_id, mode, use_knowledge_base, chunk_ids, history_text)
+        if not is_booking_intent:
+            cached_response = await asyncio.to_thread(self.cache.get, query, cache_scope, session_id)
+            if cached_response is not None:
+                await asyncio.to_thread(self._save_chat_turn, session_id, query, cached_response, reset_history)
+                
+                return {
+                    "response": cached_response,
+                    "retrieved_chunks": num_chunks,
+                    "booking_created": booking_created,
+                    "cache_hit": True
+                }
+        
         # Build prompt
-        if context:
-            prompt = f"""You are a helpful AI assistant with access to a knowledge base. Use the provided context to answer questions accurately.
-
-CONVERSATION HISTORY:
-{history_text}
-
-RELEVANT CONTEXT FROM KNOWLEDGE BASE:
-{context}
-
-USER QUERY: {query}
-
-Instructions:
-- Answer based on the context and conversation history
-- If user wants to book an interview, ONLY ask for these 4 details (don't ask about purpose, company, or topic):
-  1. Full name
-  2. Email address
-  3. Date (YYYY-MM-DD format)
-  4. Time (HH:MM format, 24-hour)
-- Once you have all 4 details, confirm them back to the user
-- Don't ask what the interview is for or who it's with
-- Be conversational and helpful
-- If context doesn't contain relevant information, say so politely
-
-RESPONSE:"""
-        else:
-            prompt = f"""You are a helpful AI assistant.
-
-CONVERSATION HISTORY:
-{history_text}
-
-USER QUERY: {query}
-
-Instructions:
-- Continue the conversation naturally
-- If user wants to book an interview, ONLY collect these 4 details (nothing more):
-  1. Full name
-  2. Email address  
-  3. Date (YYYY-MM-DD format)
-  4. Time (HH:MM format, 24-hour)
-- Don't ask what the interview is for, who it's with, or the topic
-- Once you have all 4 details, confirm them
-- Be friendly and professional
-
-RESPONSE:"""
+        template = _PROMPT_WITH_CONTEXT if context else _PROMPT_NO_CONTEXT
+        prompt = template % {"history": history_text, "context": context, "query": query}
         
         # Get LLM response
-        response = self.llm(prompt)
+        response = await self.llm.acall(prompt)
+        
+        # Cache successful answers (GroqLLM reports failures as "Error: ..." strings).
+        # The write includes a Pinecone upsert, so it runs in the default executor without
+        # being awaited; cache.set logs its own errors.
+        if not is_booking_intent and not response.startswith("Error:"):
+            asyncio.get_running_loop().run_in_executor(
+                None, self.cache.set, query, response, cache_scope, session_id
+            )
         
         # Update conversation history
-        history.append({"role": "user", "content": query})
-        history.append({"role": "assistant", "content": response})
-        self._save_chat_history(session_id, history)
+        await asyncio.to_thread(self._save_chat_turn, session_id, query, response, reset_history)
         
         return {
             "response": response,
             "retrieved_chunks": num_chunks,
-            "booking_created": booking_created
+            "booking_created": booking_created,
+            "cache_hit": False
         }
 
 
-# Singleton instance
-_rag_service = None
+# Singleton instance (built lazily once per process; warmed up in the background at startup)
+_rag_service: Optional[ConversationalRAGService] = None
+_rag_service_lock = threading.Lock()
+
 
 def get_rag_service() -> ConversationalRAGService:
-    """Get or create the RAG service singleton."""
+    """Get or create the RAG service singleton (thread-safe, built on first use)."""
     global _rag_service
     if _rag_service is None:
-        _rag_service = ConversationalRAGService()
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = ConversationalRAGService()
     return _rag_service
\ No newline at end of file
@@ -7,14 +7,59 @@ handling API keys, request formatting, and error parsing.
 """
 
 import os
-import requests
-from typing import Optional, List, Any, Mapping
+import asyncio
+import httpx
+from typing import Optional, List, Any, Mapping, Dict
 from langchain_core.language_models.llms import LLM
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+GROQ_BASE_URL = "https://api.groq.com"
+GROQ_CHAT_PATH = "/openai/v1/chat/completions"
+GROQ_TIMEOUT = 60  # Seconds; long completions can take a while
+GROQ_MAX_CONCURRENCY = 8  # Max in-flight Groq requests per worker (rate limit guard)
+
+# Shared keep-alive client for sync calls, so repeated calls reuse the TCP+TLS connection
+_sync_client = httpx.Client(base_url=GROQ_BASE_URL, http2=True, timeout=GROQ_TIMEOUT)
+
+# Shared async HTTP client and rate-limit semaphore.
+# Both are created lazily so they bind to the running event loop.
+_async_client: Optional[httpx.AsyncClient] = None
+_groq_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        # HTTP/2 multiplexes concurrent Groq calls over one kept-alive connection
+        _async_client = httpx.AsyncClient(
+            base_url=GROQ_BASE_URL,
+            http2=True,
+            timeout=GROQ_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=100)
+        )
+    return _async_client
+
+
+def _get_groq_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore limiting concurrent Groq calls, creating it on first use."""
+    global _groq_semaphore
+    if _groq_semaphore is None:
+        _groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+    return _groq_semaphore
+
+
+async def close_async_client() -> None:
+    """Close the shared async HTTP client (called on application shutdown)."""
+    global _async_client, _groq_semaphore
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _groq_semaphore = None
+
 
 class GroqLLM(LLM):
     """
@@ -24,6 +69,7 @@ class GroqLLM(LLM):
     Usage:
         llm = GroqLLM()  # API key loaded automatically
         response = llm("What is the capital of France?")
+        response = await llm.acall("What is the capital of France?")  # non-blocking
     """
     
     api_key: Optional[str] = None
@@ -50,6 +96,25 @@ class GroqLLM(LLM):
         """Return identifier for this LLM"""
         return "groq"
     
+    def _build_request(self, prompt: str, stop: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Build the headers and JSON body for a Groq chat completion request"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "messages": [{"role": "user", "content": prompt}],
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        
+        # Add stop sequences if provided
+        if stop:
+            data["stop"] = stop
+        
+        return {"headers": headers, "json": data}
+    
     def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
         """
         Call Groq API with error handling
@@ -62,31 +127,46 @@ class GroqLLM(LLM):
             Generated text response
         """
         try:
-            url = "https://api.groq.com/openai/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            data = {
-                "messages": [{"role": "user", "content": prompt}],
-                "model": self.model,
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens
-            }
+            response = _sync_client.post(GROQ_CHAT_PATH, **self._build_request(prompt, stop))
+            response.raise_for_status()
+            
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
             
-            # Add stop sequences if provided
-            if stop:
-                data["stop"] = stop
+        except httpx.TimeoutException:
+            return "Error: Request timed out. Please try again."
+        except httpx.HTTPError as e:
+            return f"Error: Network error calling Groq API - {str(e)}"
+        except KeyError as e:
+            return f"Error: Unexpected response format from Groq API - {str(e)}"
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    async def acall(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        """
+        Call Groq API without blocking the event loop
+        
+        Uses the shared httpx.AsyncClient and caps concurrent requests
+        with a semaphore to stay within Groq's rate limits.
+        
+        Args:
+            prompt: The input prompt/question
+            stop: Optional list of stop sequences
             
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+        Returns:
+            Generated text response
+        """
+        try:
+            async with _get_groq_semaphore():
+                response = await get_async_client().post(GROQ_CHAT_PATH, **self._build_request(prompt, stop))
             response.raise_for_status()
             
             result = response.json()
             return result["choices"][0]["message"]["content"]
             
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             return "Error: Request timed out. Please try again."
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             return f"Error: Network error calling Groq API - {str(e)}"
         except KeyError as e:
             return f"Error: Unexpected response format from Groq API - {str(e)}"
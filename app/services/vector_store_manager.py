@@ -4,82 +4,265 @@ Manages the connection and interaction with your chosen
 Vector Store (Pinecone/Qdrant). It handles the embedding generation and 
 the vector storage/retrieval logic used by both the ingestion and RAG services.'''
 
-from typing import List
-from app.core.db import pinecone_index, _pc
+import hashlib
+import logging
+import orjson
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+from app.core.db import pinecone_index, _pc, redis_client
 
-def embed_and_store_chunks(chunks: List[str], document_id: str):
+logger = logging.getLogger(__name__)
+
+# Pinecone Inference API accepts at most 96 inputs per embed request
+EMBED_BATCH_SIZE = 96
+# Max concurrent embed+upsert batches per document (stays within Pinecone QPS)
+MAX_CONCURRENT_BATCHES = 4
+# Query embeddings shared across workers via Redis expire after 24 hours
+QUERY_EMBEDDING_TTL = 3600 * 24
+
+
+def _embed_batch(batch: List[Tuple[int, str]], document_id: str) -> List[dict]:
+    """
+    Generates embeddings for one batch of chunks and builds the Pinecone upsert records.
+
+    Args:
+        batch: (chunk index within the document, chunk text) pairs.
+        document_id: The unique ID of the document these chunks belong to.
+
+    Returns:
+        A list of records ready for upsert (empty if embedding failed).
+    """
+    records = []
+    
+    try:
+        # Call Pinecone's Inference API to generate embeddings
+        embeddings = _pc.inference.embed(
+            model="multilingual-e5-large",
+            inputs=[chunk_text for _, chunk_text in batch],
+            parameters={"input_type": "passage", "truncate": "END"}
+        )
+        
+        # Create records for upsert
+        for (chunk_index, chunk_text), embedding_obj in zip(batch, embeddings):
+            
+            # Create a unique ID for each chunk
+            chunk_id = f"{document_id}-{chunk_index}"
+            
+            # Prepare metadata
+            metadata = {
+                "text": chunk_text,
+                "document_id": document_id,
+                "chunk_index": chunk_index
+            }
+            
+            # Add to records list
+            records.append({
+                "id": chunk_id,
+                "values": embedding_obj['values'],
+                "metadata": metadata
+            })
+            
+    except Exception:
+        logger.exception("Error generating embeddings for batch %d", batch[0][0])
+        # In a production app, you might want to retry or raise the error
+    
+    return records
+
+
+def _upsert_records(records: List[dict]) -> None:
+    """Upserts records into the Pinecone index, re-raising any error."""
+    try:
+        # Store all chunks in the default namespace (no namespace parameter)
+        # Chunks are distinguished by document_id in their metadata
+        # This allows cross-document search while still being able to filter by document_id
+        pinecone_index.upsert(vectors=records)
+    except Exception:
+        logger.exception("Error upserting to Pinecone")
+        raise
+
+
+def _embed_and_upsert_batch(batch: List[Tuple[int, str]], document_id: str) -> int:
+    """Embeds and upserts one batch of chunks; returns the number of records stored."""
+    records = _embed_batch(batch, document_id)
+    if records:
+        _upsert_records(records)
+    return len(records)
+
+
+def _iter_unique_chunks(chunks: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (chunk index, chunk text) for the first occurrence of each distinct chunk.
+    Repeated boilerplate (headers, footers, disclaimers) is embedded only once per
+    document; skipped duplicates keep their index free, so later chunk ids are unchanged.
+    """
+    seen = set()
+    for chunk_index, chunk_text in enumerate(chunks):
+        digest = hashlib.blake2b(chunk_text.encode("utf-8"), digest_size=16).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        yield chunk_index, chunk_text
+
+
+def _iter_batches(chunks: Iterable[str]) -> Iterator[List[Tuple[int, str]]]:
+    """
+    Groups the document's distinct chunks into batches of EMBED_BATCH_SIZE
+    (chunk index, chunk text) pairs.
+    Works on any iterable, so a chunk generator is consumed one batch at a time.
+    """
+    unique_chunks = _iter_unique_chunks(chunks)
+    while batch := list(islice(unique_chunks, EMBED_BATCH_SIZE)):
+        yield batch
+
+
+def embed_and_store_chunks(chunks: Iterable[str], document_id: str) -> Tuple[int, int]:
     """
     Generates embeddings for the given text chunks using Pinecone's Inference API
     and stores them in the Pinecone index.
+    Batches are embedded and upserted concurrently in a thread pool (the work is
+    network-bound), so a document costs about one round-trip per MAX_CONCURRENT_BATCHES batches.
+    Each batch is dispatched as soon as it fills and a slot is free, so a chunk
+    generator is only consumed as fast as batches are stored.
+    This blocks, so async callers should run it in a worker thread.
 
     Args:
-        chunks: A list of text strings to be embedded and stored.
+        chunks: The text strings (list or iterator) to be embedded and stored.
         document_id: The unique ID of the document these chunks belong to.
                      This is used as a namespace or metadata filter.
-    """
-    if not chunks:
-        return
 
+    Returns:
+        The number of distinct chunks and the number of vectors stored (lower
+        if embedding failed for some batches).
+
+    Raises:
+        Exception: The first upsert error, raised only after every dispatched
+                   batch has finished, so a rollback can't race with them.
+    """
     # Prepare the data for Pinecone
     # We will use the 'multilingual-e5-large' model for embeddings as it is a strong general-purpose model
     # supported by Pinecone's inference API.
     # Note: Ensure your Pinecone index is configured with dimension 1024 for this model.
     
-    # Create embedding records
-    records = []
+    # Generate embeddings using Pinecone's Inference API and upsert them.
+    # We process in batches of 96 (the embed limit, also under the 100-vector upsert limit);
+    # each chunk carries its index, so chunk ids keep the document order.
+    distinct = 0
+    stored = 0
+    # Leaving the with block waits for all submitted batches, even when an error is raised
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES) as executor:
+        pending = set()
+        for batch in _iter_batches(chunks):
+            if len(pending) >= MAX_CONCURRENT_BATCHES:
+                # Wait for a free slot before reading further
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                stored += sum(future.result() for future in done)
+            pending.add(executor.submit(_embed_and_upsert_batch, batch, document_id))
+            distinct += len(batch)
+        stored += sum(future.result() for future in pending)
+
+    if stored:
+        logger.info("Successfully stored %d chunks for document %s", stored, document_id)
+    return distinct, stored
+
+
+def delete_document_chunks(document_id: str, num_chunks: int):
+    """
+    Deletes all stored chunks of a document from the Pinecone index
+    (used to roll back a failed ingestion).
+
+    Args:
+        document_id: The unique ID of the document the chunks belong to.
+        num_chunks: The number of chunks that were generated for the document.
+    """
+    chunk_ids = [f"{document_id}-{i}" for i in range(num_chunks)]
     
-    # Generate embeddings using Pinecone's Inference API
-    # We process in batches to avoid hitting API limits
-    batch_size = 96 
-    for i in range(0, len(chunks), batch_size):
-        batch_chunks = chunks[i : i + batch_size]
-        
-        try:
-            # Call Pinecone's Inference API to generate embeddings
-            embeddings = _pc.inference.embed(
-                model="multilingual-e5-large",
-                inputs=batch_chunks,
-                parameters={"input_type": "passage", "truncate": "END"}
-            )
-            
-            # Create records for upsert
-            for j, embedding_obj in enumerate(embeddings):
-                chunk_index = i + j
-                chunk_text = batch_chunks[j]
-                
-                # Create a unique ID for each chunk
-                chunk_id = f"{document_id}_chunk_{chunk_index}"
-                
-                # Prepare metadata
-                metadata = {
-                    "text": chunk_text,
-                    "document_id": document_id,
-                    "chunk_index": chunk_index
-                }
-                
-                # Add to records list
-                records.append({
-                    "id": chunk_id,
-                    "values": embedding_obj['values'],
-                    "metadata": metadata
-                })
-                
-        except Exception as e:
-            print(f"Error generating embeddings for batch {i}: {e}")
-            # In a production app, you might want to retry or raise the error
-            continue
+    # Pinecone accepts at most 1000 ids per delete request
+    for i in range(0, len(chunk_ids), 1000):
+        pinecone_index.delete(ids=chunk_ids[i : i + 1000])
 
-    # Upsert to Pinecone
-    if records:
+
+def _get_redis_embedding_key(query: str) -> str:
+    """Generate Redis key for a query embedding."""
+    return f"emb:query:{hashlib.sha1(query.encode('utf-8')).hexdigest()}"
+
+
+@lru_cache(maxsize=1024)
+def _embed_query_cached(query: str) -> Tuple[float, ...]:
+    """
+    Embeds a query once per process; returned as a tuple so the cached value is immutable.
+    In-process misses are looked up in Redis before calling Pinecone, so other
+    workers (and restarts) reuse embeddings computed elsewhere.
+    """
+    key = _get_redis_embedding_key(query)
+    
+    if redis_client:
+        try:
+            cached = redis_client.get(key)
+            if cached:
+                return tuple(orjson.loads(cached))
+        except Exception:
+            logger.exception("Error reading query embedding from Redis")
+    
+    query_embedding = _pc.inference.embed(
+        model="multilingual-e5-large",
+        inputs=[query],
+        parameters={"input_type": "query"}
+    )
+    values = query_embedding[0]['values']
+    
+    if redis_client:
         try:
-            # Store all chunks in the default namespace (no namespace parameter)
-            # Chunks are distinguished by document_id in their metadata
-            # This allows cross-document search while still being able to filter by document_id
-            pinecone_index.upsert(vectors=records)
-            print(f"Successfully stored {len(records)} chunks for document {document_id}")
-        except Exception as e:
-            print(f"Error upserting to Pinecone: {e}")
-            raise e
+            redis_client.setex(key, QUERY_EMBEDDING_TTL, orjson.dumps(values))
+        except Exception:
+            logger.exception("Error caching query embedding in Redis")
+    
+    return tuple(values)
+
+
+def embed_query(query: str) -> List[float]:
+    """
+    Generates the embedding for a single query string using Pinecone's Inference API.
+    Shared by the retrieval path and the LLM answer cache so both use the same model.
+    Embeddings are deterministic, so repeated queries are served from an in-process
+    LRU cache backed by Redis.
+
+    Args:
+        query: The text to embed.
+
+    Returns:
+        The embedding vector as a list of floats.
+    """
+    return list(_embed_query_cached(query))
+
+
+def query_pinecone(vector: List[float], top_k: int = 3, document_id: str = None):
+    """
+    Queries the Pinecone index (default namespace) with an embedding vector.
+    
+    Args:
+        vector: The query embedding.
+        top_k: The number of similar chunks to return.
+        document_id: Optional. If provided, filters results to only this document.
+        
+    Returns:
+        A list of matches with text and score.
+    """
+    query_params = {
+        "vector": vector,
+        "top_k": top_k,
+        "include_metadata": True,
+        "include_values": False
+    }
+    
+    # Add metadata filter if document_id is specified
+    if document_id:
+        query_params["filter"] = {"document_id": {"$eq": document_id}}
+    
+    results = pinecone_index.query(**query_params)
+    
+    return results['matches']
 
 
 def search_similar_chunks(query: str, top_k: int = 3, document_id: str = None):
@@ -95,30 +278,12 @@ def search_similar_chunks(query: str, top_k: int = 3, document_id: str = None):
         A list of matches with text and score.
     """
     try:
-        # 1. Generate embedding for the query using Pinecone's Inference API
-        query_embedding = _pc.inference.embed(
-            model="multilingual-e5-large",
-            inputs=[query],
-            parameters={"input_type": "query"}
-        )
+        # 1. Generate embedding for the query (cached for repeated queries)
+        query_vector = embed_query(query)
         
         # 2. Search in Pinecone (default namespace, where all documents are stored)
-        # If document_id is provided, we can filter by metadata
-        query_params = {
-            "vector": query_embedding[0]['values'],
-            "top_k": top_k,
-            "include_metadata": True,
-            "include_values": False
-        }
-        
-        # Add metadata filter if document_id is specified
-        if document_id:
-            query_params["filter"] = {"document_id": {"$eq": document_id}}
-        
-        results = pinecone_index.query(**query_params)
-        
-        return results['matches']
+        return query_pinecone(query_vector, top_k=top_k, document_id=document_id)
         
-    except Exception as e:
-        print(f"Error searching Pinecone: {e}")
-        return []
\ No newline at end of file
+    except Exception:
+        logger.exception("Error searching Pinecone")
+        return []
@@ -1,30 +1,17 @@
 '''
 This is the root of the entire FastAPI application. 
-It creates the main FastAPI() instance and includes/registers 
-all the routers defined in app/api/endpoints.py.'''
+It creates the main FastAPI() instance through app.factory.create_app(),
+which includes/registers all the routers defined in app/api/endpoints.py.'''
 
-from fastapi import FastAPI
-from app.api import endpoints
-from app.core.db import Base, ndb
+import logging
 
-app = FastAPI(
-    title="RAGTask Backend API",
-    description="Two REST APIs: 1) Document Ingestion API, 2) Conversational RAG API with Redis memory and interview booking.",
-    version="1.0.0"
-) 
+# Configure logging once, before the app modules (which log while connecting) are imported
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    handlers=[logging.StreamHandler()]
+)
 
-# Create database tables
-# Import models to register them with Base
-from app.api.models import DocumentMetadata, InterviewBooking
-if ndb is not None:
-    Base.metadata.create_all(bind=ndb)
+from app.factory import create_app
 
-# ============================================
-# Register the two main API routers
-# ============================================
-
-# API 1: Document Ingestion (POST /documents/upload/)
-app.include_router(endpoints.document_router)
-
-# API 2: Conversational RAG (POST /RAG/chat)
-app.include_router(endpoints.rag_router)
\ No newline at end of file
+app = create_app()
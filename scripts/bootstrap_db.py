@@ -0,0 +1,37 @@
+'''
+One-shot database bootstrap:
+Creates any missing tables, upgrades tables created by earlier versions
+(see SCHEMA_MIGRATIONS in app/core/db.py) and exits. Run it once per deploy
+(as a release or migration job) instead of having every web worker check the
+schema at startup.
+
+Usage (from the repository root):
+    python -m scripts.bootstrap_db'''
+
+import logging
+import sys
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    handlers=[logging.StreamHandler()]
+)
+
+from app.core.db import create_tables, ndb
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> int:
+    """Creates the tables; returns the process exit code."""
+    if ndb is None:
+        logger.error("DATABASE_URL or NEON_DB_URL is not set; nothing to bootstrap.")
+        return 1
+    
+    create_tables()
+    logger.info("Database tables are in place.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())